@@ -4,18 +4,31 @@
 from __future__ import annotations
 
 import argparse
-import importlib.util
 import os
-import shutil
-import subprocess
+import re
 import sys
-import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from string import Template
 from types import ModuleType
 
-
-def _parse_args() -> argparse.Namespace:
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+# string.Template's placeholder syntax as a bytes pattern.
+_PLACEHOLDER_RE = re.compile(
+	Template.pattern.pattern.encode("ascii"), Template.pattern.flags & ~re.UNICODE
+)
+# KEY=value per line; values may be quoted, and " #" starts a trailing comment.
+_ENV_RE = re.compile(
+	r"""^[ \t]*(?P<key>[A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*"""
+	r"""(?:"(?P<double>[^"\n]*)"|'(?P<single>[^'\n]*)'|(?P<bare>[^\n]*?))"""
+	r"""[ \t]*(?:(?<=[ \t])#[^\n]*)?$""",
+	re.M,
+)
+_UTILS_MODULE_CACHE: dict[Path, ModuleType] = {}
+
+
+def _build_parser() -> argparse.ArgumentParser:
 	parser = argparse.ArgumentParser(description=__doc__)
 	parser.add_argument(
 		"destination",
@@ -34,21 +47,24 @@ def _parse_args() -> argparse.Namespace:
 		action="store_true",
 		help="Allow scaffolding into a non-empty destination directory.",
 	)
-	return parser.parse_args()
+	return parser
 
 
-def _slugify(value: str) -> str:
-	import re
+_PARSER = _build_parser()
+
+
+def _parse_args() -> argparse.Namespace:
+	return _PARSER.parse_args()
+
 
-	tokens = re.findall(r"[A-Za-z0-9]+", value)
+def _slugify(value: str) -> str:
+	tokens = _TOKEN_RE.findall(value)
 	slug = "-".join(token.lower() for token in tokens)
 	return slug or "mod"
 
 
 def _pascal_case(value: str) -> str:
-	import re
-
-	tokens = re.findall(r"[A-Za-z0-9]+", value)
+	tokens = _TOKEN_RE.findall(value)
 	return "".join(token.capitalize() for token in tokens) or "ModProject"
 
 
@@ -66,12 +82,6 @@ def _ensure_destination(destination: Path, *, force: bool) -> None:
 		destination.mkdir(parents=True)
 
 
-def _is_binary_file(path: Path) -> bool:
-	with path.open("rb") as handle:
-		sample = handle.read(1024)
-	return b"\0" in sample
-
-
 PATH_PATTERNS = {
 	"TemplateScript.cs": "${mod_class_name}.cs",
 	"template_project.csproj": "${project_filename}",
@@ -79,31 +89,31 @@ PATH_PATTERNS = {
 }
 
 
+def _env_value(match: re.Match[str]) -> str:
+	return next(group for group in match.group("double", "single", "bare") if group is not None)
+
+
 def _load_env_file(env_path: Path) -> None:
 	if not env_path.exists():
 		return
 
-	for raw_line in env_path.read_text(encoding="utf-8").splitlines():
-		line = raw_line.strip()
-		if not line or line.startswith("#"):
-			continue
-		if "=" not in line:
-			continue
-
-		key, value = line.split("=", 1)
-		key = key.strip()
-		value = value.strip()
-
-		if not key:
-			continue
+	assignments = list(_ENV_RE.finditer(env_path.read_text(encoding="utf-8")))
+	# Iterate in reverse so the first assignment of a repeated key wins.
+	new_env = {
+		match["key"]: _env_value(match)
+		for match in reversed(assignments)
+		if match["key"] not in os.environ
+	}
+	os.environ.update(new_env)
 
-		if len(value) >= 2 and value[0] == value[-1] and value[0] in {'"', "'"}:
-			value = value[1:-1]
 
-		os.environ.setdefault(key, value)
+def _load_template_utils(template_utils_path: Path) -> ModuleType:
+	import importlib.util
 
+	cached = _UTILS_MODULE_CACHE.get(template_utils_path)
+	if cached is not None:
+		return cached
 
-def _load_template_utils(template_utils_path: Path) -> ModuleType:
 	if not template_utils_path.exists():
 		raise SystemExit(f"Template utility script not found at {template_utils_path}")
 
@@ -115,6 +125,7 @@ def _load_template_utils(template_utils_path: Path) -> ModuleType:
 
 	module = importlib.util.module_from_spec(spec)
 	spec.loader.exec_module(module)
+	_UTILS_MODULE_CACHE[template_utils_path] = module
 	return module
 
 
@@ -142,57 +153,110 @@ def _validate_required_paths(utils_module: ModuleType, env_path: Path) -> None:
 
 	raise SystemExit("\n".join(message_lines))
 
-def _render_relative_path(relative: Path, values: dict[str, str]) -> Path:
-	if relative == Path('.'):
-		return Path('.')
+def _render_path_parts(values: dict[str, str]) -> dict[str, str]:
+	return {
+		part: Template(pattern).substitute(values)
+		for part, pattern in PATH_PATTERNS.items()
+	}
+
+
+def _render_bytes(data: bytes, values: dict[bytes, bytes]) -> tuple[bytes, list[str]]:
+	missing: set[str] = set()
+
+	def _replace(match: re.Match[bytes]) -> bytes:
+		if match.group("escaped") is not None:
+			return b"$"
+		braced = match.group("braced")
+		key = match.group("named") or braced
+		if key is None:
+			return match.group(0)
+		value = values.get(key)
+		if value is None:
+			if braced is not None:
+				missing.add(braced.decode("ascii"))
+			return match.group(0)
+		return value
+
+	rendered = _PLACEHOLDER_RE.sub(_replace, data)
+	return rendered, sorted(missing)
+
+
+def _scan_template_tree(
+	template_dir: str, destination: str, rendered_parts: dict[str, str]
+) -> tuple[list[str], list[tuple[str, str]]]:
+	directories: list[str] = []
+	files: list[tuple[str, str]] = []
+	stack: list[tuple[str, str]] = [(template_dir, destination)]
+	while stack:
+		source_dir, dest_dir = stack.pop()
+		dest_prefix = dest_dir + os.sep
+		with os.scandir(source_dir) as entries:
+			for entry in entries:
+				dest_path = dest_prefix + rendered_parts.get(entry.name, entry.name)
+				if entry.is_dir(follow_symlinks=False):
+					directories.append(dest_path)
+					stack.append((entry.path, dest_path))
+				elif entry.is_file(follow_symlinks=False):
+					files.append((entry.path, dest_path))
+				elif entry.is_symlink():
+					# Like os.walk, copy linked files but do not descend into linked dirs.
+					if entry.is_dir():
+						directories.append(dest_path)
+					elif entry.is_file():
+						files.append((entry.path, dest_path))
+	return directories, files
+
+
+def _render_template_file(source_path: str, values: dict[bytes, bytes]) -> bytes:
+	with open(source_path, "rb") as handle:
+		data = handle.read()
+	if b"\0" in data[:1024] or b"$" not in data:
+		return data
+
+	rendered, missing = _render_bytes(data, values)
+	if missing:
+		raise SystemExit(
+			f"Missing placeholder(s) {', '.join(missing)} while processing {source_path}"
+		)
+	return rendered
+
 
-	parts: list[str] = []
-	for part in relative.parts:
-		pattern = PATH_PATTERNS.get(part, part)
-		rendered = Template(pattern).substitute(values)
-		parts.append(rendered)
-	return Path(*parts)
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+
+def _write_file(dest_path: str, data: bytes) -> None:
+	fd = os.open(dest_path, _WRITE_FLAGS, 0o644)
+	try:
+		view = memoryview(data)
+		while view:
+			view = view[os.write(fd, view):]
+	finally:
+		os.close(fd)
 
 
 def _copy_template(template_dir: Path, destination: Path, values: dict[str, str]) -> None:
-	for root, dirnames, filenames in os.walk(template_dir):
-		root_path = Path(root)
-		relative_root = root_path.relative_to(template_dir)
-		rendered_root = _render_relative_path(relative_root, values)
-		dest_root = destination / rendered_root
-		dest_root.mkdir(parents=True, exist_ok=True)
-
-		for dirname in dirnames:
-			relative_dir = relative_root / dirname
-			rendered_dir = _render_relative_path(relative_dir, values)
-			(destination / rendered_dir).mkdir(parents=True, exist_ok=True)
-
-		for filename in filenames:
-			source_path = root_path / filename
-			relative_path = relative_root / filename
-			rendered_relative = _render_relative_path(relative_path, values)
-			dest_path = destination / rendered_relative
-			dest_path.parent.mkdir(parents=True, exist_ok=True)
-
-			if _is_binary_file(source_path):
-				shutil.copy2(source_path, dest_path)
-				continue
-
-			text = source_path.read_text(encoding="utf-8")
-			template = Template(text)
-			required_keys = {
-				match.group("braced")
-				for match in template.pattern.finditer(text)
-				if match.group("braced")
-			}
-			missing = sorted(key for key in required_keys if key not in values)
-			if missing:
-				raise SystemExit(
-					f"Missing placeholder(s) {', '.join(missing)} while processing {source_path}"
-				)
+	directories, files = _scan_template_tree(
+		os.fspath(template_dir), os.fspath(destination), _render_path_parts(values)
+	)
+	values_bytes = {key.encode("utf-8"): value.encode("utf-8") for key, value in values.items()}
+	sources = [source_path for source_path, _ in files]
+	dest_paths = [dest_path for _, dest_path in files]
 
-			rendered_text = template.safe_substitute(values)
-			dest_path.write_text(rendered_text, encoding="utf-8")
+	with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+		# Render everything before writing, so a missing placeholder aborts
+		# before anything lands in the destination.
+		rendered = list(executor.map(_render_template_file, sources, repeat(values_bytes)))
+
+		destination.mkdir(parents=True, exist_ok=True)
+		# Parents are always listed before their children, so a single mkdir is enough.
+		for directory in directories:
+			try:
+				os.mkdir(directory)
+			except FileExistsError:
+				pass
+
+		for _ in executor.map(_write_file, dest_paths, rendered):
+			pass
 
 
 def _copy_default_dotenv(destination: Path, env_path: Path) -> None:
@@ -203,7 +267,9 @@ def _copy_default_dotenv(destination: Path, env_path: Path) -> None:
 	if dest_env.exists():
 		return
 
-	shutil.copy2(env_path, dest_env)
+	import shutil
+
+	shutil.copyfile(env_path, dest_env)
 
 
 def _run_initial_decomp(destination: Path) -> None:
@@ -211,10 +277,31 @@ def _run_initial_decomp(destination: Path) -> None:
 	if not deploy_script.exists():
 		raise SystemExit(f"Expected deploy script at {deploy_script}")
 
+	import importlib.util
+
+	# Every path it touches is derived from its own __file__, so cwd is irrelevant.
+	spec = importlib.util.spec_from_file_location("hos_mod_utils_deploy", deploy_script)
+	if spec is not None and spec.loader is not None:
+		module = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(module)
+		entry_point = getattr(module, "main", None)
+		if callable(entry_point):
+			entry_point(["--get-dlls"])
+			return
+
+	import subprocess
+
 	command = [sys.executable, str(deploy_script), "--get-dlls"]
 	subprocess.run(command, cwd=deploy_script.parent, check=True)
 
 
+def _new_guid() -> str:
+	import uuid
+
+	digits = uuid.uuid4().hex.upper()
+	return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
 def _build_values(args: argparse.Namespace) -> dict[str, str]:
 	mod_name = args.mod_name
 	project_name = _pascal_case(mod_name)
@@ -223,8 +310,8 @@ def _build_values(args: argparse.Namespace) -> dict[str, str]:
 	mod_slug = _slugify(mod_name)
 	package_prefix = mod_slug
 	mod_harmony_id = f"com.hexofsteel.{mod_slug}"
-	project_guid = str(uuid.uuid4()).upper()
-	solution_guid = str(uuid.uuid4()).upper()
+	project_guid = _new_guid()
+	solution_guid = _new_guid()
 
 	return {
 		"mod_name": mod_name,
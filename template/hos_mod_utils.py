@@ -4,19 +4,18 @@
 from __future__ import annotations
 
 import argparse
-import io
+import contextlib
+import functools
 import json
 import os
 import re
-import shutil
-import subprocess
 import sys
-import tempfile
-import zipfile
+import time
 from pathlib import Path
-from typing import NoReturn
-from urllib import error as urlerror
-from urllib import request as urlrequest
+from typing import TYPE_CHECKING, BinaryIO, Iterator, NoReturn
+
+if TYPE_CHECKING:
+    from urllib.request import OpenerDirector
 
 MOD_NAME = "${mod_name}"
 PACKAGE_PREFIX = "${package_prefix}"
@@ -39,40 +38,50 @@ REQUIRED_DLLS = [
     "UnityEngine.UIModule.dll",
 ]
 
+_HOME = os.path.expanduser("~")
+_SCRIPT_DIR = Path(__file__).resolve().parent
+
+LIBRARIES_STAMP_NAME = ".refresh_stamp.json"
 
 HARMONY_PACKAGE_ID = "lib.harmony.thin"
 NUGET_FLAT_BASE_URL = "https://api.nuget.org/v3-flatcontainer"
+NUGET_SEARCH_URL = "https://azuresearch-usnc.nuget.org/query"
+HARMONY_VERSION_MAX_AGE_SECONDS = 24 * 60 * 60
+# Class constants sit near the top of decompiled sources, so only this much is scanned first.
+VERSION_SCAN_BYTES = 32 * 1024
+# Skip the first-run banner and telemetry upload on every build.
+DOTNET_ENV_OVERRIDES = {
+    "DOTNET_CLI_TELEMETRY_OPTOUT": "1",
+    "DOTNET_NOLOGO": "1",
+    "DOTNET_SKIP_FIRST_TIME_EXPERIENCE": "1",
+}
 
 
-def _apply_env_file(env_path: Path) -> None:
-    for raw_line in env_path.read_text(encoding="utf-8").splitlines():
-        line = raw_line.strip()
-        if not line or line.startswith("#"):
-            continue
+# KEY=value per line; values may be quoted, and " #" starts a trailing comment.
+_ENV_RE = re.compile(
+    r"""^[ \t]*(?P<key>[A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*"""
+    r"""(?:"(?P<double>[^"\n]*)"|'(?P<single>[^'\n]*)'|(?P<bare>[^\n]*?))"""
+    r"""[ \t]*(?:(?<=[ \t])#[^\n]*)?$""",
+    re.M,
+)
+_VERSION_RE = re.compile(rb"VERSION\s*=\s*\"([^\"]+)\"")
 
-        if "=" not in line:
-            continue
 
-        key, value = line.split("=", 1)
-        key = key.strip()
-        value = value.strip()
+def _env_value(match: re.Match[str]) -> str:
+    return next(group for group in match.group("double", "single", "bare") if group is not None)
 
-        if not key:
-            continue
-
-        if len(value) >= 2 and value[0] == value[-1] and value[0] in {'"', "'"}:
-            value = value[1:-1]
 
-        os.environ.setdefault(key, value)
+def _apply_env_file(env_path: Path) -> None:
+    for match in _ENV_RE.finditer(env_path.read_text(encoding="utf-8")):
+        os.environ.setdefault(match["key"], _env_value(match))
 
 
 def load_env_overrides() -> None:
     """Load .env files located next to this script or its parent directory."""
 
-    script_dir = Path(__file__).resolve().parent
-    search_dirs = [script_dir]
-    parent_dir = script_dir.parent
-    if parent_dir != script_dir:
+    search_dirs = [_SCRIPT_DIR]
+    parent_dir = _SCRIPT_DIR.parent
+    if parent_dir != _SCRIPT_DIR:
         search_dirs.append(parent_dir)
 
     seen: set[Path] = set()
@@ -87,6 +96,13 @@ def load_env_overrides() -> None:
 
 load_env_overrides()
 
+# Resolved after the .env files so XDG_CACHE_HOME can be set there too.
+HARMONY_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME") or os.path.join(_HOME, ".cache"))
+    / "hos_mod_setup"
+    / "harmony"
+)
+
 
 def _raise_missing_path(description: str, env_var: str, candidates: list[Path]) -> NoReturn:
     lines = "\n".join(f" - {candidate}" for candidate in candidates) or " - (no predefined locations)"
@@ -97,6 +113,91 @@ def _raise_missing_path(description: str, env_var: str, candidates: list[Path])
     )
 
 
+# Windows and macOS volumes are case-insensitive by default, so compare names the same way.
+_CASE_INSENSITIVE_FS = sys.platform in ("win32", "darwin")
+
+
+def _fs_name(name: str) -> str:
+    return name.casefold() if _CASE_INSENSITIVE_FS else name
+
+
+def _list_files(directory: Path) -> dict[str, os.DirEntry]:
+    with os.scandir(directory) as entries:
+        return {_fs_name(entry.name): entry for entry in entries if entry.is_file()}
+
+
+def _first_existing_dir(candidates: list[Path]) -> Path | None:
+    listings: dict[Path, set[str]] = {}
+    for path in candidates:
+        if path.name in ("", ".", ".."):
+            # Roots and relative markers never show up in a parent listing.
+            if path.is_dir():
+                return path
+            continue
+
+        parent = path.parent
+        child_dirs = listings.get(parent)
+        if child_dirs is None:
+            child_dirs = set()
+            try:
+                with os.scandir(parent) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            child_dirs.add(_fs_name(entry.name))
+            except OSError:
+                pass
+            listings[parent] = child_dirs
+
+        if _fs_name(path.name) in child_dirs:
+            return path
+    return None
+
+
+_HOS_CONFIG_PARTS = ("War Frogs Studio", "Hex of Steel")
+_HOS_INSTALL_PARTS = ("steamapps", "common", "Hex of Steel", "Hex of Steel_Data", "Managed")
+
+_MOD_INSTALL_CANDIDATES = tuple(
+    Path(path)
+    for path in (
+        os.path.join(
+            _HOME, ".var", "app", "com.valvesoftware.Steam", "config", "unity3d",
+            *_HOS_CONFIG_PARTS, "MODS",
+        ),
+        os.path.join(_HOME, ".config", "unity3d", *_HOS_CONFIG_PARTS, "MODS"),
+        os.path.join(_HOME, "Library", "Application Support", *_HOS_CONFIG_PARTS, "MODS"),
+        os.path.join(_HOME, "AppData", "LocalLow", *_HOS_CONFIG_PARTS, "MODS"),
+        os.path.join(_HOME, "Hex of Steel", "MODS"),
+    )
+)
+_MANAGED_DIR_CANDIDATES = tuple(
+    Path(path)
+    for path in (
+        os.path.join(
+            _HOME, ".var", "app", "com.valvesoftware.Steam", ".steam", "steam",
+            *_HOS_INSTALL_PARTS,
+        ),
+        os.path.join(_HOME, ".steam", "steam", *_HOS_INSTALL_PARTS),
+        os.path.join(_HOME, ".local", "share", "Steam", *_HOS_INSTALL_PARTS),
+        os.path.join(_HOME, "SteamLibrary", *_HOS_INSTALL_PARTS),
+        "/Applications/Hex of Steel.app/Contents/Resources/Data/Managed",
+        os.path.join(
+            _HOME, "Library", "Application Support", "Steam", "steamapps", "common",
+            "Hex of Steel", "Hex of Steel.app", "Contents", "Resources", "Data", "Managed",
+        ),
+        os.path.join(
+            _HOME, "Library", "Application Support", *_HOS_CONFIG_PARTS,
+            "Hex of Steel_Data", "Managed",
+        ),
+    )
+)
+_MANAGED_DIR_FALLBACK = Path(os.path.join(_HOME, "Hex of Steel_Data", "Managed"))
+
+
+def _unique_paths(paths: list[Path]) -> list[Path]:
+    # Remove duplicates while preserving order
+    return list(dict.fromkeys(paths))
+
+
 def determine_mod_install_path() -> Path:
     """Return the most likely Hex of Steel MODS directory.
 
@@ -111,61 +212,13 @@ def determine_mod_install_path() -> Path:
     candidates: list[Path] = []
     env_path = os.environ.get("HOS_MODS_PATH")
     if env_path:
-        candidates.append(Path(env_path).expanduser())
-
-    flatpak_path = (
-        Path.home()
-        / ".var"
-        / "app"
-        / "com.valvesoftware.Steam"
-        / "config"
-        / "unity3d"
-        / "War Frogs Studio"
-        / "Hex of Steel"
-        / "MODS"
-    )
-    native_linux_path = (
-        Path.home()
-        / ".config"
-        / "unity3d"
-        / "War Frogs Studio"
-        / "Hex of Steel"
-        / "MODS"
-    )
-    macos_path = (
-        Path.home()
-        / "Library"
-        / "Application Support"
-        / "War Frogs Studio"
-        / "Hex of Steel"
-        / "MODS"
-    )
-    windows_locallow_path = (
-        Path.home()
-        / "AppData"
-        / "LocalLow"
-        / "War Frogs Studio"
-        / "Hex of Steel"
-        / "MODS"
-    )
-    fallback_path = Path.home() / "Hex of Steel" / "MODS"
-
-    candidates.extend(
-        [flatpak_path, native_linux_path, macos_path, windows_locallow_path, fallback_path]
-    )
-
-    # Remove duplicates while preserving order
-    unique_candidates: list[Path] = []
-    seen = set()
-    for path in candidates:
-        resolved = path.expanduser()
-        if resolved not in seen:
-            unique_candidates.append(resolved)
-            seen.add(resolved)
+        candidates.append(Path(os.path.expanduser(env_path)))
+    candidates.extend(_MOD_INSTALL_CANDIDATES)
 
-    for path in unique_candidates:
-        if path.exists() and path.is_dir():
-            return path
+    unique_candidates = _unique_paths(candidates)
+    found = _first_existing_dir(unique_candidates)
+    if found is not None:
+        return found
 
     _raise_missing_path(
         "the Hex of Steel MODS directory",
@@ -185,92 +238,25 @@ def determine_game_managed_dir() -> Path:
     candidates: list[Path] = []
     env_path = os.environ.get("HOS_MANAGED_DIR")
     if env_path:
-        candidates.append(Path(env_path).expanduser())
-
-    flatpak_managed = Path.home() / (
-        ".var/app/com.valvesoftware.Steam/.steam/steam/steamapps/common/Hex of Steel/"
-        "Hex of Steel_Data/Managed"
-    )
-    native_linux_managed = Path.home() / (
-        ".steam/steam/steamapps/common/Hex of Steel/Hex of Steel_Data/Managed"
-    )
-    linux_local_share = Path.home() / (
-        ".local/share/Steam/steamapps/common/Hex of Steel/Hex of Steel_Data/Managed"
-    )
-    steam_library_under_home = Path.home() / (
-        "SteamLibrary/steamapps/common/Hex of Steel/Hex of Steel_Data/Managed"
-    )
-    mac_app_bundle = Path("/Applications/Hex of Steel.app/Contents/Resources/Data/Managed")
-    mac_steam_bundle = (
-        Path.home()
-        / "Library"
-        / "Application Support"
-        / "Steam"
-        / "steamapps"
-        / "common"
-        / "Hex of Steel"
-        / "Hex of Steel.app"
-        / "Contents"
-        / "Resources"
-        / "Data"
-        / "Managed"
-    )
-    mac_config_copy = (
-        Path.home()
-        / "Library"
-        / "Application Support"
-        / "War Frogs Studio"
-        / "Hex of Steel"
-        / "Hex of Steel_Data"
-        / "Managed"
-    )
+        candidates.append(Path(os.path.expanduser(env_path)))
+    candidates.extend(_MANAGED_DIR_CANDIDATES)
 
     windows_roots = [
         os.environ.get("ProgramFiles(x86)"),
         os.environ.get("ProgramFiles"),
         "C:/Program Files (x86)",
     ]
-    windows_candidates = []
     for root in windows_roots:
         if not root:
             continue
-        windows_candidates.append(
-            Path(root)
-            / "Steam"
-            / "steamapps"
-            / "common"
-            / "Hex of Steel"
-            / "Hex of Steel_Data"
-            / "Managed"
-        )
+        candidates.append(Path(os.path.join(root, "Steam", *_HOS_INSTALL_PARTS)))
 
-    fallback_path = Path.home() / "Hex of Steel_Data" / "Managed"
+    candidates.append(_MANAGED_DIR_FALLBACK)
 
-    candidates.extend(
-        [
-            flatpak_managed,
-            native_linux_managed,
-            linux_local_share,
-            steam_library_under_home,
-            mac_app_bundle,
-            mac_steam_bundle,
-            mac_config_copy,
-            *windows_candidates,
-            fallback_path,
-        ]
-    )
-
-    unique_candidates: list[Path] = []
-    seen = set()
-    for path in candidates:
-        resolved = Path(path).expanduser()
-        if resolved not in seen:
-            unique_candidates.append(resolved)
-            seen.add(resolved)
-
-    for path in unique_candidates:
-        if path.exists() and path.is_dir():
-            return path
+    unique_candidates = _unique_paths(candidates)
+    found = _first_existing_dir(unique_candidates)
+    if found is not None:
+        return found
 
     _raise_missing_path(
         "the Hex of Steel Managed directory",
@@ -279,10 +265,96 @@ def determine_game_managed_dir() -> Path:
     )
 
 
-def download_latest_harmony() -> tuple[str, bytes]:
+@functools.cache
+def _nuget_opener() -> OpenerDirector:
+    """Return the opener shared by every NuGet request; JSON is requested gzip-compressed."""
+    from urllib import request as urlrequest
+
+    opener = urlrequest.build_opener()
+    opener.addheaders = [
+        ("User-Agent", "hos_mod_utils"),
+        ("Accept-Encoding", "gzip"),
+    ]
+    return opener
+
+
+@contextlib.contextmanager
+def _open_nuget(url: str, *, timeout: float) -> Iterator[BinaryIO]:
+    import gzip
+
+    with _nuget_opener().open(url, timeout=timeout) as response:
+        if response.headers.get("Content-Encoding", "").lower() == "gzip":
+            with gzip.GzipFile(fileobj=response) as decoded:
+                yield decoded
+        else:
+            yield response
+
+
+def _read_cached_harmony_version() -> str | None:
+    version_path = HARMONY_CACHE_DIR / "latest-version.txt"
+    try:
+        if time.time() - version_path.stat().st_mtime > HARMONY_VERSION_MAX_AGE_SECONDS:
+            return None
+        version = version_path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return version or None
+
+
+def _write_harmony_cache(name: str, data: bytes) -> None:
+    import tempfile
+
+    # The cache only saves network round trips, so failing to write it is not an error.
+    try:
+        HARMONY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(prefix=f".{name}.", dir=HARMONY_CACHE_DIR)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            # A partial write must never be visible under the name later reads trust.
+            os.replace(temp_name, HARMONY_CACHE_DIR / name)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_name)
+            raise
+    except OSError:
+        pass
+
+
+def _search_latest_harmony_version() -> str | None:
+    """Ask the NuGet search API for the latest stable version only."""
+    import http.client
+
+    search_url = (
+        f"{NUGET_SEARCH_URL}?q=packageid:{HARMONY_PACKAGE_ID}"
+        "&prerelease=false&semVerLevel=2.0.0&take=1"
+    )
+    try:
+        with _open_nuget(search_url, timeout=30) as response:
+            payload = json.load(response)
+    except (OSError, http.client.HTTPException, ValueError):
+        # Timeouts and truncated or corrupt bodies fall back to the index as well.
+        return None
+
+    results = payload.get("data") if isinstance(payload, dict) else None
+    if not isinstance(results, list):
+        return None
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        if str(result.get("id", "")).lower() == HARMONY_PACKAGE_ID:
+            version = result.get("version")
+            return version if isinstance(version, str) and version else None
+    return None
+
+
+def _list_latest_harmony_version() -> str:
+    """Fall back to the flat container index, which lists every published version."""
+    from urllib import error as urlerror
+
     metadata_url = f"{NUGET_FLAT_BASE_URL}/{HARMONY_PACKAGE_ID}/index.json"
     try:
-        with urlrequest.urlopen(metadata_url, timeout=30) as response:
+        with _open_nuget(metadata_url, timeout=30) as response:
             metadata = json.load(response)
     except urlerror.URLError as error:
         raise SystemExit(
@@ -292,46 +364,75 @@ def download_latest_harmony() -> tuple[str, bytes]:
     versions = metadata.get("versions")
     if not versions:
         raise SystemExit("No versions returned for lib.harmony.thin from NuGet")
+    return versions[-1]
 
-    version = versions[-1]
-    package_url = (
-        f"{NUGET_FLAT_BASE_URL}/{HARMONY_PACKAGE_ID}/{version}/"
-        f"{HARMONY_PACKAGE_ID}.{version}.nupkg"
-    )
 
-    try:
-        with urlrequest.urlopen(package_url, timeout=60) as response:
-            package_bytes = response.read()
-    except urlerror.URLError as error:
-        raise SystemExit(
-            f"Failed to download Harmony package {package_url}: {error}"
-        ) from error
+def _extract_harmony_dll(package_file: BinaryIO) -> bytes:
+    import zipfile
+
+    preferred_targets = [
+        "lib/net48/",
+        "lib/net472/",
+        "lib/net452/"
+    ]
 
-    with zipfile.ZipFile(io.BytesIO(package_bytes)) as archive:
-        candidates = [
-            name
-            for name in archive.namelist()
-            if name.lower().endswith("0harmony.dll") and name.startswith("lib/")
-        ]
-        if not candidates:
+    def select_key(info: zipfile.ZipInfo) -> tuple[int, int]:
+        path = info.filename
+        lower = path.lower()
+        for index, marker in enumerate(preferred_targets):
+            if marker in lower:
+                return (index, len(path))
+        return (len(preferred_targets), len(path))
+
+    with zipfile.ZipFile(package_file) as archive:
+        selected = min(
+            (
+                info
+                for info in archive.infolist()
+                if info.filename.startswith("lib/")
+                and info.filename.lower().endswith("0harmony.dll")
+            ),
+            key=select_key,
+            default=None,
+        )
+        if selected is None:
             raise SystemExit("Harmony package did not contain 0Harmony.dll")
+        return archive.read(selected)
+
+
+def download_latest_harmony() -> tuple[str, bytes]:
+    import shutil
+    import tempfile
+    from urllib import error as urlerror
+
+    version = _read_cached_harmony_version()
+    if version is None:
+        version = _search_latest_harmony_version() or _list_latest_harmony_version()
+        _write_harmony_cache("latest-version.txt", version.encode("utf-8"))
 
-        preferred_targets = [
-            "lib/net48/",
-            "lib/net472/",
-            "lib/net452/"
-        ]
+    cached_dll = HARMONY_CACHE_DIR / f"0Harmony-{version}.dll"
+    if cached_dll.is_file():
+        return version, cached_dll.read_bytes()
 
-        def select_key(path: str) -> tuple[int, int]:
-            lower = path.lower()
-            for index, marker in enumerate(preferred_targets):
-                if marker in lower:
-                    return (index, len(path))
-            return (len(preferred_targets), len(path))
+    package_url = (
+        f"{NUGET_FLAT_BASE_URL}/{HARMONY_PACKAGE_ID}/{version}/"
+        f"{HARMONY_PACKAGE_ID}.{version}.nupkg"
+    )
 
-        selected = min(candidates, key=select_key)
-        dll_bytes = archive.read(selected)
+    # Not SpooledTemporaryFile: before 3.11 it lacks seekable(), which ZipFile needs.
+    with tempfile.TemporaryFile() as package_file:
+        try:
+            with _open_nuget(package_url, timeout=60) as response:
+                shutil.copyfileobj(response, package_file, 64 * 1024)
+        except urlerror.URLError as error:
+            raise SystemExit(
+                f"Failed to download Harmony package {package_url}: {error}"
+            ) from error
 
+        package_file.seek(0)
+        dll_bytes = _extract_harmony_dll(package_file)
+
+    _write_harmony_cache(cached_dll.name, dll_bytes)
     return version, dll_bytes
 
 
@@ -343,15 +444,36 @@ def ensure_harmony_library(libraries_dir: Path) -> None:
     libraries_dir.mkdir(parents=True, exist_ok=True)
     version, dll_bytes = download_latest_harmony()
     harmony_path.write_bytes(dll_bytes)
-    print(f"Downloaded Harmony {version} to {harmony_path}")
+    print(f"Added Harmony {version} to {harmony_path}")
 
 
-def run(command: list[str], *, cwd: Path) -> None:
-    """Execute an external command and raise on failure."""
-    subprocess.run(command, cwd=cwd, check=True)
+def run(command: list[str], *, cwd: Path, env: dict[str, str] | None = None) -> None:
+    """Execute an external command and exit with its return code on failure.
+
+    ``env`` entries are added on top of the current environment.
+    """
+    import subprocess
+
+    try:
+        subprocess.run(
+            command, cwd=cwd, check=True, env={**os.environ, **env} if env else None
+        )
+    except subprocess.CalledProcessError as error:
+        raise SystemExit(error.returncode) from error
+
+
+def _read_libraries_stamp(stamp_path: Path) -> dict | None:
+    try:
+        with stamp_path.open(encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
 
 
 def refresh_libraries(root: Path) -> None:
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor
+
     managed_dir = determine_game_managed_dir()
     if not managed_dir.exists() or not managed_dir.is_dir():
         raise SystemExit(f"Managed directory not found at {managed_dir}")
@@ -359,41 +481,90 @@ def refresh_libraries(root: Path) -> None:
     libraries_dir = root / "Libraries"
     libraries_dir.mkdir(parents=True, exist_ok=True)
 
-    ensure_harmony_library(libraries_dir)
+    library_files = _list_files(libraries_dir)
+    if _fs_name("0Harmony.dll") not in library_files:
+        ensure_harmony_library(libraries_dir)
+
+    # Validate every source up front so a missing DLL is reported before anything is removed.
+    managed_files = _list_files(managed_dir)
+    missing = [name for name in REQUIRED_DLLS if _fs_name(name) not in managed_files]
+    if missing:
+        raise SystemExit(
+            f"Required libraries missing from {managed_dir}: {', '.join(missing)}"
+        )
+
+    source_stats: dict[str, list[int]] = {}
+    for dll_name in REQUIRED_DLLS:
+        source_stat = managed_files[_fs_name(dll_name)].stat()
+        source_stats[dll_name] = [source_stat.st_mtime_ns, source_stat.st_size]
+
+    def copy_is_current(dll_name: str) -> bool:
+        entry = library_files.get(_fs_name(dll_name))
+        if entry is None:
+            return False
+        # copy2 preserves the modification time, so an untouched copy matches its source.
+        copy_stat = entry.stat()
+        return [copy_stat.st_mtime_ns, copy_stat.st_size] == source_stats[dll_name]
+
+    # Anything the cleanup below would delete also forces a refresh.
+    expected_names = {_fs_name(dll_name) for dll_name in REQUIRED_DLLS}
+    has_foreign_dlls = any(
+        name.endswith(".dll") and name not in expected_names and name.lower() != "0harmony.dll"
+        for name in library_files
+    )
+
+    # The Managed DLLs only change when the game updates, so skip the copy when
+    # they match what was copied last time and every copy is still unmodified.
+    stamp = {"managed_dir": str(managed_dir), "dlls": source_stats}
+    stamp_path = libraries_dir / LIBRARIES_STAMP_NAME
+    if (
+        not has_foreign_dlls
+        and _read_libraries_stamp(stamp_path) == stamp
+        and all(copy_is_current(dll_name) for dll_name in REQUIRED_DLLS)
+    ):
+        print(f"Libraries already match {managed_dir}; skipping copy")
+        return
 
     for dll_path in libraries_dir.glob("*.dll"):
         if dll_path.name.lower() != "0harmony.dll":
             dll_path.unlink(missing_ok=True)
 
-    for dll_name in REQUIRED_DLLS:
-        source = managed_dir / dll_name
-        if not source.exists():
-            raise SystemExit(f"Required library {dll_name} missing at {source}")
-        shutil.copy2(source, libraries_dir / dll_name)
+    def copy_dll(dll_name: str) -> None:
+        shutil.copy2(managed_dir / dll_name, libraries_dir / dll_name)
+
+    with ThreadPoolExecutor(max_workers=min(8, len(REQUIRED_DLLS))) as executor:
+        for _ in executor.map(copy_dll, REQUIRED_DLLS):
+            pass
+
+    stamp_path.write_text(json.dumps(stamp, indent=2), encoding="utf-8")
 
 
 def compute_package_dir(package_root: Path, mod_version: str) -> Path:
     prefix = f"{PACKAGE_PREFIX}-v{mod_version}-"
+    prefix_length = len(prefix)
     highest_index = 0
 
-    if package_root.exists():
-        for entry in package_root.iterdir():
-            name = entry.name
-            if not name.startswith(prefix):
-                continue
+    try:
+        with os.scandir(package_root) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.startswith(prefix):
+                    continue
 
-            suffix = name[len(prefix):]
-            if entry.is_file():
-                suffix = suffix.split(".", 1)[0]
+                suffix = name[prefix_length:]
+                if not entry.is_dir():
+                    suffix = suffix.partition(".")[0]
 
-            if suffix.isdigit():
-                highest_index = max(highest_index, int(suffix))
+                if suffix.isdigit():
+                    highest_index = max(highest_index, int(suffix))
+    except FileNotFoundError:
+        pass
 
     next_index = highest_index + 1
     return package_root / f"{prefix}{next_index}"
 
 
-def parse_args() -> tuple[argparse.Namespace, argparse.ArgumentParser]:
+def parse_args(argv: list[str] | None = None) -> tuple[argparse.Namespace, argparse.ArgumentParser]:
     parser = argparse.ArgumentParser(description=f"Build and package the {MOD_NAME} mod.")
     parser.add_argument(
         "--deploy",
@@ -419,23 +590,88 @@ def parse_args() -> tuple[argparse.Namespace, argparse.ArgumentParser]:
         "-r",
         dest="refresh_libs",
         action="store_true",
-        help="Refresh the Libraries directory before building (default is to skip).",
+        help=(
+            "Refresh the Libraries directory before building (default is to skip). "
+            "The copy is skipped when every DLL in Libraries already matches the game's "
+            "file in size and modification time."
+        ),
     )
-    return parser.parse_args(), parser
+    return parser.parse_args(argv), parser
+
+
+def _hardlink_or_copy(source: str, destination: str) -> None:
+    import shutil
+
+    # Linked packages share the asset's data, so an in-place edit in assets/ also
+    # changes earlier packages (documented in the README).
+    # Fall back to copying across volumes, on filesystems without links, or on name clashes.
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _retired_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.old-{os.getpid()}-{time.monotonic_ns()}")
+
+
+def _remove_tree_in_background(path: Path) -> None:
+    import shutil
+    import threading
+
+    def remove() -> None:
+        try:
+            shutil.rmtree(path)
+        except OSError as error:
+            print(f"Could not remove {path}: {error}", file=sys.stderr)
+
+    # Not a daemon thread, so the interpreter still finishes the removal before exiting.
+    threading.Thread(target=remove).start()
 
 
 def install_package(package_root: Path) -> Path:
+    import shutil
+
     install_root = determine_mod_install_path()
     target_path = install_root / package_root.name
 
     install_root.mkdir(parents=True, exist_ok=True)
-    if target_path.exists():
-        shutil.rmtree(target_path)
-    shutil.copytree(package_root, target_path)
+    # Copy next to the target first so the swap below is a same-volume rename and
+    # an interrupted install never leaves a half-copied mod in MODS.
+    staging_path = install_root / f".{package_root.name}.staging-{os.getpid()}"
+    try:
+        shutil.copytree(package_root, staging_path)
+    except BaseException:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+
+    had_previous = target_path.exists()
+    retired_path = _retired_path(target_path)
+    if had_previous:
+        os.rename(target_path, retired_path)
+    try:
+        os.rename(staging_path, target_path)
+    except OSError:
+        if had_previous:
+            os.rename(retired_path, target_path)
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+
+    if had_previous:
+        # The old copy sits in MODS with its manifest, so a failed removal must not go unnoticed.
+        try:
+            shutil.rmtree(retired_path)
+        except OSError as error:
+            raise SystemExit(
+                f"Installed {target_path}, but could not remove the previous install at "
+                f"{retired_path}: {error}\nDelete it so the game does not load the mod twice."
+            ) from error
     return target_path
 
 
 def build_and_package(root: Path, install: bool, refresh_libs: bool = False) -> None:
+    import shutil
+
     manifest_path = root / "Manifest.json"
     project_path = root / PROJECT_FILENAME
     output_dll = root / "output" / "net48" / OUTPUT_DLL_NAME
@@ -453,9 +689,7 @@ def build_and_package(root: Path, install: bool, refresh_libs: bool = False) ->
     if not project_path.exists():
         raise SystemExit(f"Project file not found at {project_path}")
 
-    with manifest_path.open(encoding="utf-8") as handle:
-        manifest = json.load(handle)
-
+    manifest = json.loads(manifest_path.read_bytes())
     mod_version = manifest.get("modVersion", "0.0.0")
 
     package_root.mkdir(parents=True, exist_ok=True)
@@ -469,7 +703,23 @@ def build_and_package(root: Path, install: bool, refresh_libs: bool = False) ->
     libraries_dir.mkdir(parents=True, exist_ok=True)
     # Additional directories get created as needed when copying assets.
 
-    run(["dotnet", "build", str(project_path), "--configuration", "Release"], cwd=root)
+    run(
+        [
+            "dotnet",
+            "build",
+            str(project_path),
+            "--configuration",
+            "Release",
+            "--nologo",
+            # Quiet still reports warnings and errors.
+            "-v:quiet",
+            "-maxcpucount",
+            "-nodeReuse:true",
+            "-p:UseSharedCompilation=true",
+        ],
+        cwd=root,
+        env=DOTNET_ENV_OVERRIDES,
+    )
 
     if not output_dll.exists():
         raise SystemExit(f"Build completed but DLL missing at {output_dll}")
@@ -478,7 +728,9 @@ def build_and_package(root: Path, install: bool, refresh_libs: bool = False) ->
     shutil.copy2(output_dll, libraries_dir / output_dll.name)
 
     if assets_dir.exists():
-        shutil.copytree(assets_dir, target_root, dirs_exist_ok=True)
+        shutil.copytree(
+            assets_dir, target_root, dirs_exist_ok=True, copy_function=_hardlink_or_copy
+        )
 
     print(f"Package created at {package_dir}")
 
@@ -488,24 +740,36 @@ def build_and_package(root: Path, install: bool, refresh_libs: bool = False) ->
 
 
 def run_decompilation(root: Path) -> Path:
-    refresh_libraries(root)
+    import shutil
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
 
     assembly_path = determine_game_managed_dir() / "Assembly-CSharp.dll"
 
-    if not assembly_path.exists():
-        raise SystemExit(f"Assembly-CSharp.dll not found at {assembly_path}")
-
-    tmp_dir = Path(tempfile.mkdtemp(prefix="hos_decompile_", dir="/tmp"))
+    # Decompile next to the final location so it can be renamed into place.
+    decompiled_root = root / "decompiled"
+    decompiled_root.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".hos_decompile_", dir=decompiled_root))
 
     try:
-        command = [
-            "ilspycmd",
-            str(assembly_path),
-            "-p",
-            "-o",
-            str(tmp_dir),
-        ]
-        run(command, cwd=root)
+        # Safe to overlap: ilspycmd only reads Managed and the refresh only writes Libraries.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            refresh_future = executor.submit(refresh_libraries, root)
+            try:
+                if not assembly_path.exists():
+                    raise SystemExit(f"Assembly-CSharp.dll not found at {assembly_path}")
+
+                command = [
+                    "ilspycmd",
+                    str(assembly_path),
+                    "-p",
+                    "-o",
+                    str(tmp_dir),
+                ]
+                run(command, cwd=root)
+            finally:
+                # A Libraries failure takes precedence, as when the refresh ran first.
+                refresh_future.result()
 
         manager_path = tmp_dir / "MultiplayerManager.cs"
         if not manager_path.exists():
@@ -514,45 +778,60 @@ def run_decompilation(root: Path) -> Path:
                 raise SystemExit("MultiplayerManager.cs not found in decompilation output")
             manager_path = candidates[0]
 
-        content = manager_path.read_text(encoding="utf-8", errors="ignore")
-        match = re.search(r"VERSION\s*=\s*\"([^\"]+)\"", content)
+        with manager_path.open("rb") as handle:
+            content = handle.read(VERSION_SCAN_BYTES)
+            match = _VERSION_RE.search(content)
+            if not match:
+                match = _VERSION_RE.search(content + handle.read())
         if not match:
             raise SystemExit("VERSION attribute not found in MultiplayerManager.cs")
 
-        version = match.group(1)
-        dest_dir = root / "decompiled" / version
+        version = match.group(1).decode("utf-8", errors="ignore")
+        dest_dir = decompiled_root / version
+
+        had_previous = dest_dir.exists()
+        retired_path = _retired_path(dest_dir)
+        if had_previous:
+            os.rename(dest_dir, retired_path)
+        try:
+            os.replace(tmp_dir, dest_dir)
+        except OSError:
+            if had_previous:
+                os.rename(retired_path, dest_dir)
+            raise
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
 
-        if dest_dir.exists():
-            shutil.rmtree(dest_dir)
-        dest_dir.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copytree(tmp_dir, dest_dir)
+    if had_previous:
+        _remove_tree_in_background(retired_path)
 
-        return dest_dir
-    finally:
-        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return dest_dir
 
 
-if __name__ == "__main__":
-    try:
-        args, parser = parse_args()
-        root = Path(__file__).resolve().parent
+def main(argv: list[str] | None = None) -> int:
+    """Run the command-line workflow; ``argv`` defaults to ``sys.argv[1:]``."""
+    args, parser = parse_args(argv)
+    root = _SCRIPT_DIR
 
-        if args.install and not args.deploy:
-            print("--install is ignored unless --deploy is also specified.")
+    if args.install and not args.deploy:
+        print("--install is ignored unless --deploy is also specified.")
 
-        performed_action = False
+    performed_action = False
 
-        if args.get_dlls:
-            decompiled_path = run_decompilation(root)
-            print(f"Assembly decompiled to {decompiled_path}")
-            performed_action = True
+    if args.get_dlls:
+        decompiled_path = run_decompilation(root)
+        print(f"Assembly decompiled to {decompiled_path}")
+        performed_action = True
 
-        if args.deploy:
-            build_and_package(root, args.install, args.refresh_libs)
-            performed_action = True
+    if args.deploy:
+        build_and_package(root, args.install, args.refresh_libs)
+        performed_action = True
 
-        if not performed_action:
-            parser.print_help()
-            sys.exit(0)
-    except subprocess.CalledProcessError as error:
-        raise SystemExit(error.returncode) from error
+    if not performed_action:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())